@@ -29,6 +29,7 @@ CREATE TABLE photos (
     tags TEXT,
     description TEXT,
     photographer VARCHAR(100),
+    s3_url VARCHAR(500),
     FOREIGN KEY (robot_id) REFERENCES robots(robot_id)
 );
 
@@ -50,3 +51,34 @@ INSERT INTO robot_categories (category_id, category_name, description) VALUES
 (1, 'Drones', 'Unmanned aerial vehicles (UAVs) for various applications'),
 (2, 'AMRs', 'Autonomous Mobile Robots for logistics and transportation'),
 (3, 'Robotic Arms', 'Industrial and collaborative robotic manipulators');
+
+-- Index for per-robot photo listings ordered by newest first
+CREATE INDEX idx_photos_robot_date ON photos(robot_id, upload_date DESC);
+
+-- Indexes for search_photos filters and the robot listing joins
+CREATE INDEX idx_robots_category ON robots(category_id);
+CREATE INDEX idx_robots_mfr_model ON robots(manufacturer, model_name);
+CREATE INDEX idx_phototags_tag ON photo_tags(tag_id, photo_id);
+
+-- Full-text search over robots, kept in sync by triggers
+CREATE VIRTUAL TABLE robots_fts USING fts5(
+    manufacturer, model_name, specifications,
+    content='robots', content_rowid='robot_id'
+);
+
+CREATE TRIGGER robots_fts_insert AFTER INSERT ON robots BEGIN
+    INSERT INTO robots_fts(rowid, manufacturer, model_name, specifications)
+    VALUES (new.robot_id, new.manufacturer, new.model_name, new.specifications);
+END;
+
+CREATE TRIGGER robots_fts_delete AFTER DELETE ON robots BEGIN
+    INSERT INTO robots_fts(robots_fts, rowid, manufacturer, model_name, specifications)
+    VALUES ('delete', old.robot_id, old.manufacturer, old.model_name, old.specifications);
+END;
+
+CREATE TRIGGER robots_fts_update AFTER UPDATE ON robots BEGIN
+    INSERT INTO robots_fts(robots_fts, rowid, manufacturer, model_name, specifications)
+    VALUES ('delete', old.robot_id, old.manufacturer, old.model_name, old.specifications);
+    INSERT INTO robots_fts(rowid, manufacturer, model_name, specifications)
+    VALUES (new.robot_id, new.manufacturer, new.model_name, new.specifications);
+END;
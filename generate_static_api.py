@@ -4,12 +4,14 @@ Generate static JSON API file for deployment
 Converts database to JSON with S3 photo URLs
 """
 
+from collections import defaultdict
+
 from robotics_photo_db import RoboticsPhotoDatabase
-import json
+import orjson
 
 # Load photo URL mapping
-with open('photo_urls.json', 'r') as f:
-    photo_urls = json.load(f)
+with open('photo_urls.json', 'rb') as f:
+    photo_urls = orjson.loads(f.read())
 
 db = RoboticsPhotoDatabase()
 db.connect()
@@ -23,41 +25,69 @@ category_emojis = {
     'Robotic Arms': '🦾'
 }
 
-marketplace_products = []
-
-for robot in robots_data:
-    # Get photo IDs for this robot
-    db.cursor.execute("""
-        SELECT photo_id
-        FROM photos
-        WHERE robot_id = ?
-        ORDER BY upload_date DESC
-    """, (robot['robot_id'],))
-    
-    photo_ids = [row['photo_id'] for row in db.cursor.fetchall()]
-    
-    # Get S3 URLs for these photos
-    s3_urls = [photo_urls[str(pid)] for pid in photo_ids if str(pid) in photo_urls]
-    
+# Shared product template data: identical for every robot, so build the
+# objects once instead of allocating fresh copies per product
+_FEATURES = (
+    {'icon': '🎯', 'title': 'Precision', 'desc': 'High accuracy operations'},
+    {'icon': '🔒', 'title': 'Safety', 'desc': 'Advanced safety systems'},
+    {'icon': '📊', 'title': 'Analytics', 'desc': 'Real-time monitoring'},
+    {'icon': '🔧', 'title': 'Maintenance', 'desc': 'Easy to service'}
+)
+
+_APPLICATIONS = ('Manufacturing', 'Warehousing', 'Logistics', 'Inspection')
+
+_DEFAULT_SPECS = {
+    'payload': '5-15 kg',
+    'battery': '30 min - 12 hrs',
+    'autonomy': 'Advanced Navigation',
+    'speed': '20 m/s'
+}
+
+_SPECS_BY_CAT = {
+    'AMRs': {
+        'payload': '5-600 kg',
+        'battery': '30 min - 12 hrs',
+        'autonomy': 'Advanced Navigation',
+        'speed': '2 m/s'
+    }
+}
+
+# Columnar build: fetch everything up front, then assemble products in
+# one pass. Photo URL keys are converted to ints once so the per-robot
+# lookups are plain dict probes.
+pid_to_url = {int(pid): url for pid, url in photo_urls.items()}
+
+db.cursor.execute("""
+    SELECT robot_id, photo_id
+    FROM photos
+    ORDER BY robot_id, upload_date DESC
+""")
+
+robot_photos = defaultdict(list)
+for row in db.cursor:
+    robot_photos[row['robot_id']].append(row['photo_id'])
+
+
+def build_product(robot):
+    """Assemble one marketplace product dict from a robot row."""
+    photo_ids = robot_photos[robot['robot_id']]
+    s3_urls = [pid_to_url[pid] for pid in photo_ids if pid in pid_to_url]
+
     # If no photos, use placeholder
     if not s3_urls:
         s3_urls = [
             f"https://via.placeholder.com/400x300?text={robot['manufacturer']}+{robot['model_name']}"
         ]
-    
-    # Ensure we have at least 4 images for gallery
-    while len(s3_urls) < 4:
-        s3_urls.append(s3_urls[0])
-    
-    # Build product object
-    product = {
+
+    # The frontend pads the gallery to 4 images
+    return {
         'id': robot['robot_id'],
         'name': robot['model_name'],
         'vendor': robot['manufacturer'],
         'price': 'Contact for Quote',
         'priceNote': 'Custom pricing based on requirements',
         'image': s3_urls[0],
-        'images': s3_urls[:4],
+        'images': s3_urls,
         'category': robot['category_name'],
         'type': robot['robot_type'],
         'rating': 4.8,
@@ -67,30 +97,23 @@ for robot in robots_data:
         'inStock': True,
         'verified': True,
         'description': f"Professional {robot['robot_type']} from {robot['manufacturer']}. " + 
-                      (f"Released in {robot['year_released']}. " if robot.get('year_released') else "") +
+                      (f"Released in {robot['year_released']}. " if robot['year_released'] else "") +
                       f"{len(photo_ids)} photo(s) available.",
-        'specs': {
-            'payload': '5-600 kg' if robot['category_name'] == 'AMRs' else '5-15 kg',
-            'battery': '30 min - 12 hrs',
-            'autonomy': 'Advanced Navigation',
-            'speed': '2 m/s' if robot['category_name'] == 'AMRs' else '20 m/s'
-        },
-        'features': [
-            {'icon': '🎯', 'title': 'Precision', 'desc': 'High accuracy operations'},
-            {'icon': '🔒', 'title': 'Safety', 'desc': 'Advanced safety systems'},
-            {'icon': '📊', 'title': 'Analytics', 'desc': 'Real-time monitoring'},
-            {'icon': '🔧', 'title': 'Maintenance', 'desc': 'Easy to service'}
-        ],
-        'applications': ['Manufacturing', 'Warehousing', 'Logistics', 'Inspection']
+        'specs': _SPECS_BY_CAT.get(robot['category_name'], _DEFAULT_SPECS),
+        'features': _FEATURES,
+        'applications': _APPLICATIONS
     }
-    
-    marketplace_products.append(product)
+
+
+marketplace_products = [build_product(robot) for robot in robots_data]
 
 db.close()
 
-# Save as static JSON file
-with open('api/database-robots.json', 'w') as f:
-    json.dump(marketplace_products, f, indent=2)
+# Save as static JSON file: serialize once in memory, then write in one go.
+# No pretty printing - the deployed artifact is only read by the frontend.
+body = orjson.dumps(marketplace_products)
+with open('api/database-robots.json', 'wb', buffering=1 << 20) as f:
+    f.write(body)
 
 print(f"✓ Generated api/database-robots.json with {len(marketplace_products)} products")
 print(f"✓ All photos using S3 URLs")
@@ -4,83 +4,56 @@ Integrated Robotics Marketplace with Photo Database
 Serves the marketplace website with real photos from the database
 """
 
-from flask import Flask, render_template_string, send_file, jsonify
+from collections import defaultdict
+from functools import lru_cache
+
+from flask import Flask, Response, g, request, send_file, send_from_directory
+from PIL import Image
 from robotics_photo_db import RoboticsPhotoDatabase
 from pathlib import Path
-import json
+import io
+import orjson
+import time
 
 app = Flask(__name__)
 
+# The catalog changes rarely, so cache the serialized response for a minute
+CACHE_TTL_SECONDS = 60
+_robots_cache = {'ts': 0.0, 'body': None}
+
 # Read the original HTML file
 with open('robotics-marketplace-FIXED.html', 'r') as f:
     MARKETPLACE_HTML = f.read()
 
+# Split the HTML once at import so each request only concatenates three
+# pieces instead of scanning the whole document with str.replace
+_RENDER_CALL = '// Initial render\n        renderProducts();'
+_HTML_PREFIX, _HTML_SUFFIX = MARKETPLACE_HTML.split(_RENDER_CALL, 1)
 
-@app.route('/')
-def marketplace():
-    """Serve the marketplace with database integration."""
-    # Get robots and photos from database
-    db = RoboticsPhotoDatabase()
-    db.connect()
-    
-    robots_data = db.list_all_robots()
-    
-    # Get photos for each robot
-    robots_with_photos = []
-    for robot in robots_data:
-        # Get all photos for this robot
-        db.cursor.execute("""
-            SELECT photo_id, file_path, file_name, description, photo_type
-            FROM photos
-            WHERE robot_id = ?
-            ORDER BY upload_date DESC
-        """, (robot['robot_id'],))
-        
-        photos = db.cursor.fetchall()
-        photo_urls = [f"/api/photo/{p['photo_id']}" for p in photos] if photos else []
-        
-        robots_with_photos.append({
-            'robot_id': robot['robot_id'],
-            'name': f"{robot['manufacturer']} {robot['model_name']}",
-            'manufacturer': robot['manufacturer'],
-            'model': robot['model_name'],
-            'type': robot['robot_type'],
-            'category': robot['category_name'],
-            'year': robot['year_released'],
-            'photo_count': robot['photo_count'],
-            'photos': photo_urls
-        })
-    
-    db.close()
-    
-    # Inject database data into the HTML
-    # We'll add a script that replaces the hardcoded products with database products
-    database_script = f"""
+# Static wrapper around the per-request robots JSON payload
+_SCRIPT_HEAD = """
     <script>
     // Database-driven products
-    const databaseRobots = {json.dumps(robots_with_photos)};
+    const databaseRobots = """
+
+_SCRIPT_TAIL = """;
     
     // Convert database robots to marketplace product format
-    const databaseProducts = databaseRobots.map(robot => {{
-        const categoryEmojis = {{
+    const databaseProducts = databaseRobots.map(robot => {
+        const categoryEmojis = {
             'Drones': '🚁',
             'AMRs': '🤖',
             'Robotic Arms': '🦾'
-        }};
+        };
         
-        return {{
+        return {
             id: robot.robot_id,
             name: robot.model,
             vendor: robot.manufacturer,
             price: 'Contact for Quote',
             priceNote: 'Custom pricing based on fleet size',
-            image: robot.photos[0] || 'https://via.placeholder.com/400x300?text=' + robot.name,
-            images: robot.photos.length > 0 ? robot.photos : [
-                'https://via.placeholder.com/400x300?text=' + robot.name,
-                'https://via.placeholder.com/400x300?text=' + robot.name,
-                'https://via.placeholder.com/400x300?text=' + robot.name,
-                'https://via.placeholder.com/400x300?text=' + robot.name
-            ],
+            image: robot.photos[0],
+            images: robot.photos,
             category: robot.category,
             type: robot.type,
             rating: 4.8,
@@ -88,54 +61,167 @@ def marketplace():
             emoji: categoryEmojis[robot.category] || '🤖',
             inStock: true,
             verified: true,
-            description: `Professional ${{robot.type}} from ${{robot.manufacturer}}. Year: ${{robot.year || 'N/A'}}. ${{robot.photo_count}} photos available in database.`,
-            specs: {{
+            description: `Professional ${robot.type} from ${robot.manufacturer}. Year: ${robot.year || 'N/A'}. ${robot.photo_count} photos available in database.`,
+            specs: {
                 payload: robot.category === 'Drones' ? '5-10 kg' : robot.category === 'AMRs' ? '250-600 kg' : '5-15 kg',
                 battery: robot.category === 'Drones' ? '30-45 min' : '8-12 hrs',
                 autonomy: 'Advanced SLAM',
                 speed: robot.category === 'Drones' ? '20 m/s' : robot.category === 'AMRs' ? '2 m/s' : 'N/A'
-            }},
+            },
             features: [
-                {{ icon: '🎯', title: 'Precision', desc: 'High accuracy operations' }},
-                {{ icon: '🔒', title: 'Safety', desc: 'Advanced safety features' }},
-                {{ icon: '📊', title: 'Analytics', desc: 'Real-time monitoring' }},
-                {{ icon: '🔧', title: 'Maintenance', desc: 'Easy to service' }}
+                { icon: '🎯', title: 'Precision', desc: 'High accuracy operations' },
+                { icon: '🔒', title: 'Safety', desc: 'Advanced safety features' },
+                { icon: '📊', title: 'Analytics', desc: 'Real-time monitoring' },
+                { icon: '🔧', title: 'Maintenance', desc: 'Easy to service' }
             ],
             applications: ['Manufacturing', 'Warehousing', 'Logistics', 'Inspection']
-        }};
-    }});
+        };
+    });
     
     // Replace the original products array with database products
     // This will be injected before the renderProducts() call
     console.log('Loaded ' + databaseProducts.length + ' robots from database');
     products = databaseProducts;
     </script>
-    """
     
-    # Insert the database script before the closing </body> tag
-    # We need to inject it before renderProducts() is called
-    html_with_db = MARKETPLACE_HTML.replace(
-        '// Initial render\n        renderProducts();',
-        database_script + '\n        // Initial render\n        renderProducts();'
-    )
-    
-    return html_with_db
+        """
+
+
+def _get_db():
+    """Get the shared database connection for this request context."""
+    db = getattr(g, 'db', None)
+    if db is None:
+        db = RoboticsPhotoDatabase()
+        db.connect()
+        g.db = db
+    return db
+
+
+@app.teardown_appcontext
+def _close_db(exception):
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+
+# photo_id -> file_path cache so image requests skip the database
+_photo_paths = {}
+
+
+def _photo_path(photo_id):
+    """Resolve a photo's file path, loading the full mapping on first miss."""
+    try:
+        return _photo_paths[photo_id]
+    except KeyError:
+        pass
+    db = _get_db()
+    db.cursor.execute("SELECT photo_id, file_path FROM photos")
+    for row in db.cursor:
+        _photo_paths[row['photo_id']] = row['file_path']
+    # Remember ids still absent after the reload so repeated requests
+    # for a bad id don't rescan the whole table
+    return _photo_paths.setdefault(photo_id, None)
+
+# All photos live under this root; serving them relative to it lets
+# werkzeug handle conditional (304/Range) responses efficiently
+_PHOTO_ROOT = Path('photo_storage').resolve()
+
+
+class _ThumbnailUnavailable(Exception):
+    """Missing or undecodable photo; raised so lru_cache skips the miss."""
+
+
+@lru_cache(maxsize=512)
+def _cached_thumbnail(photo_id):
+    """Downscaled JPEG bytes for marketplace card images, cached in RAM."""
+    path = _photo_path(photo_id)
+    if not path or not Path(path).exists():
+        raise _ThumbnailUnavailable(photo_id)
+    try:
+        image = Image.open(path)
+        image.thumbnail((400, 300))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        buf = io.BytesIO()
+        image.save(buf, 'JPEG', quality=80, optimize=True)
+    except OSError:
+        # Corrupt/non-image file: let the handler serve the original
+        raise _ThumbnailUnavailable(photo_id)
+    return buf.getvalue()
+
+
+def _thumbnail(photo_id):
+    """Thumbnail bytes, or None without caching the miss (the photo may
+    simply not have finished uploading yet)."""
+    try:
+        return _cached_thumbnail(photo_id)
+    except _ThumbnailUnavailable:
+        return None
+
+
+@app.route('/')
+def marketplace():
+    """Serve the marketplace with database integration."""
+    # Get robots and photos from database
+    db = _get_db()
+
+    # Single JOIN returns each robot with its photo IDs already grouped
+    robots_data = db.list_all_robots_with_photos()
+
+    robots_with_photos = []
+    for robot in robots_data:
+        # Send a single placeholder for photo-less robots instead of
+        # having the frontend build the same URL four times
+        photo_urls = [f"/api/photo/{pid}" for pid in robot['photo_ids']] or [
+            f"https://via.placeholder.com/400x300?text={robot['manufacturer']}+{robot['model_name']}"
+        ]
+
+        robots_with_photos.append({
+            'robot_id': robot['robot_id'],
+            'name': f"{robot['manufacturer']} {robot['model_name']}",
+            'manufacturer': robot['manufacturer'],
+            'model': robot['model_name'],
+            'type': robot['robot_type'],
+            'category': robot['category_name'],
+            'year': robot['year_released'],
+            'photo_count': robot['photo_count'],
+            'photos': photo_urls
+        })
+
+    # Inject database data into the HTML: only the JSON payload is
+    # per-request, everything around it is pre-built constants.
+    # Escape '</' so the payload can never close the script tag early.
+    payload = orjson.dumps(robots_with_photos).decode('utf-8').replace('</', '<\\/')
+
+    return (_HTML_PREFIX + _SCRIPT_HEAD + payload + _SCRIPT_TAIL
+            + _RENDER_CALL + _HTML_SUFFIX)
 
 
 @app.route('/api/photo/<int:photo_id>')
 def serve_photo(photo_id):
     """Serve photos from the database."""
-    db = RoboticsPhotoDatabase()
-    db.connect()
-    
-    db.cursor.execute("SELECT file_path FROM photos WHERE photo_id = ?", (photo_id,))
-    result = db.cursor.fetchone()
-    db.close()
-    
+    # Marketplace cards only render at 400x300, so serve a cached
+    # thumbnail instead of the full-size file when asked
+    if request.args.get('thumb'):
+        body = _thumbnail(photo_id)
+        if body is not None:
+            return Response(body, mimetype='image/jpeg',
+                            headers={'Cache-Control': 'public, max-age=86400, immutable'})
+
+    result = _photo_path(photo_id)
+
     if result:
-        photo_path = Path(result[0])
+        photo_path = Path(result).resolve()
         if photo_path.exists():
-            return send_file(photo_path, mimetype='image/jpeg')
+            try:
+                rel = photo_path.relative_to(_PHOTO_ROOT)
+                resp = send_from_directory(_PHOTO_ROOT, str(rel),
+                                           mimetype='image/jpeg', conditional=True)
+            except ValueError:
+                # Path stored outside the storage root; fall back to send_file
+                resp = send_file(photo_path, mimetype='image/jpeg', conditional=True)
+            resp.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+            return resp
     
     return "Photo not found", 404
 
@@ -143,21 +229,32 @@ def serve_photo(photo_id):
 @app.route('/api/robots')
 def get_robots():
     """API endpoint to get all robots with photos."""
-    db = RoboticsPhotoDatabase()
-    db.connect()
-    
+    if _robots_cache['body'] is not None and time.time() - _robots_cache['ts'] < CACHE_TTL_SECONDS:
+        resp = Response(_robots_cache['body'], mimetype='application/json')
+        resp.headers['Cache-Control'] = 'public, max-age=60'
+        return resp
+
+    db = _get_db()
+
     robots_data = db.list_all_robots()
-    
+
+    # Fetch all photos in one query instead of one query per robot
+    db.cursor.execute("""
+        SELECT robot_id, photo_id, file_name, description
+        FROM photos
+        ORDER BY robot_id
+    """)
+
+    photos_by_robot = defaultdict(list)
+    for row in db.cursor:
+        photos_by_robot[row['robot_id']].append(
+            {'photo_id': row['photo_id'], 'file_name': row['file_name'],
+             'description': row['description']})
+
     robots_with_photos = []
     for robot in robots_data:
-        db.cursor.execute("""
-            SELECT photo_id, file_name, description
-            FROM photos
-            WHERE robot_id = ?
-        """, (robot['robot_id'],))
-        
-        photos = [dict(p) for p in db.cursor.fetchall()]
-        
+        photos = photos_by_robot[robot['robot_id']]
+
         robots_with_photos.append({
             'robot_id': robot['robot_id'],
             'manufacturer': robot['manufacturer'],
@@ -168,9 +265,13 @@ def get_robots():
             'photo_count': robot['photo_count'],
             'photos': photos
         })
-    
-    db.close()
-    return jsonify(robots_with_photos)
+
+    _robots_cache['body'] = orjson.dumps(robots_with_photos)
+    _robots_cache['ts'] = time.time()
+
+    resp = Response(_robots_cache['body'], mimetype='application/json')
+    resp.headers['Cache-Control'] = 'public, max-age=60'
+    return resp
 
 
 if __name__ == '__main__':
@@ -183,4 +284,6 @@ if __name__ == '__main__':
     print(f"\nYour marketplace now has REAL photos from the database!")
     print("\nPress Ctrl+C to stop\n")
     
-    app.run(debug=True, host='127.0.0.1', port=8082)
+    # Production WSGI server: threaded, no debug reloader overhead
+    from waitress import serve
+    serve(app, host='127.0.0.1', port=8082, threads=8)
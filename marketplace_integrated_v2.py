@@ -4,13 +4,124 @@ Simplified Robotics Marketplace with Photo Database
 Serves marketplace with real photos - fixed version
 """
 
-from flask import Flask, send_file, jsonify, send_from_directory
+from functools import lru_cache
+
+from flask import Flask, Response, g, request, send_file, send_from_directory
+from PIL import Image
 from robotics_photo_db import RoboticsPhotoDatabase
 from pathlib import Path
+import io
+import orjson
 import os
+import time
 
 app = Flask(__name__)
 
+# The catalog changes rarely, so cache the serialized response for a minute
+CACHE_TTL_SECONDS = 60
+_robots_cache = {'ts': 0.0, 'body': None}
+
+
+# Shared product template data: identical for every robot, so build the
+# objects once instead of allocating fresh copies per product
+_FEATURES = (
+    {'icon': '🎯', 'title': 'Precision', 'desc': 'High accuracy operations'},
+    {'icon': '🔒', 'title': 'Safety', 'desc': 'Advanced safety systems'},
+    {'icon': '📊', 'title': 'Analytics', 'desc': 'Real-time monitoring'},
+    {'icon': '🔧', 'title': 'Maintenance', 'desc': 'Easy to service'}
+)
+
+_APPLICATIONS = ('Manufacturing', 'Warehousing', 'Logistics', 'Inspection')
+
+_DEFAULT_SPECS = {
+    'payload': '5-15 kg',
+    'battery': '30 min - 12 hrs',
+    'autonomy': 'Advanced Navigation',
+    'speed': '20 m/s'
+}
+
+_SPECS_BY_CAT = {
+    'AMRs': {
+        'payload': '5-600 kg',
+        'battery': '30 min - 12 hrs',
+        'autonomy': 'Advanced Navigation',
+        'speed': '2 m/s'
+    }
+}
+
+
+def _get_db():
+    """Get the shared database connection for this request context."""
+    db = getattr(g, 'db', None)
+    if db is None:
+        db = RoboticsPhotoDatabase()
+        db.connect()
+        g.db = db
+    return db
+
+
+@app.teardown_appcontext
+def _close_db(exception):
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+
+# photo_id -> file_path cache so image requests skip the database
+_photo_paths = {}
+
+
+def _photo_path(photo_id):
+    """Resolve a photo's file path, loading the full mapping on first miss."""
+    try:
+        return _photo_paths[photo_id]
+    except KeyError:
+        pass
+    db = _get_db()
+    db.cursor.execute("SELECT photo_id, file_path FROM photos")
+    for row in db.cursor:
+        _photo_paths[row['photo_id']] = row['file_path']
+    # Remember ids still absent after the reload so repeated requests
+    # for a bad id don't rescan the whole table
+    return _photo_paths.setdefault(photo_id, None)
+
+# All photos live under this root; serving them relative to it lets
+# werkzeug handle conditional (304/Range) responses efficiently
+_PHOTO_ROOT = Path('photo_storage').resolve()
+
+
+class _ThumbnailUnavailable(Exception):
+    """Missing or undecodable photo; raised so lru_cache skips the miss."""
+
+
+@lru_cache(maxsize=512)
+def _cached_thumbnail(photo_id):
+    """Downscaled JPEG bytes for marketplace card images, cached in RAM."""
+    path = _photo_path(photo_id)
+    if not path or not Path(path).exists():
+        raise _ThumbnailUnavailable(photo_id)
+    try:
+        image = Image.open(path)
+        image.thumbnail((400, 300))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        buf = io.BytesIO()
+        image.save(buf, 'JPEG', quality=80, optimize=True)
+    except OSError:
+        # Corrupt/non-image file: let the handler serve the original
+        raise _ThumbnailUnavailable(photo_id)
+    return buf.getvalue()
+
+
+def _thumbnail(photo_id):
+    """Thumbnail bytes, or None without caching the miss (the photo may
+    simply not have finished uploading yet)."""
+    try:
+        return _cached_thumbnail(photo_id)
+    except _ThumbnailUnavailable:
+        return None
+
+
 @app.route('/')
 def marketplace():
     """Serve the marketplace HTML file."""
@@ -20,17 +131,28 @@ def marketplace():
 @app.route('/api/photo/<int:photo_id>')
 def serve_photo(photo_id):
     """Serve photos from the database."""
-    db = RoboticsPhotoDatabase()
-    db.connect()
-    
-    db.cursor.execute("SELECT file_path FROM photos WHERE photo_id = ?", (photo_id,))
-    result = db.cursor.fetchone()
-    db.close()
-    
+    # Marketplace cards only render at 400x300, so serve a cached
+    # thumbnail instead of the full-size file when asked
+    if request.args.get('thumb'):
+        body = _thumbnail(photo_id)
+        if body is not None:
+            return Response(body, mimetype='image/jpeg',
+                            headers={'Cache-Control': 'public, max-age=86400, immutable'})
+
+    result = _photo_path(photo_id)
+
     if result:
-        photo_path = Path(result[0])
+        photo_path = Path(result).resolve()
         if photo_path.exists():
-            return send_file(photo_path, mimetype='image/jpeg')
+            try:
+                rel = photo_path.relative_to(_PHOTO_ROOT)
+                resp = send_from_directory(_PHOTO_ROOT, str(rel),
+                                           mimetype='image/jpeg', conditional=True)
+            except ValueError:
+                # Path stored outside the storage root; fall back to send_file
+                resp = send_file(photo_path, mimetype='image/jpeg', conditional=True)
+            resp.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+            return resp
     
     return "Photo not found", 404
 
@@ -38,43 +160,35 @@ def serve_photo(photo_id):
 @app.route('/api/database-robots')
 def get_database_robots():
     """API endpoint to get all robots with photos from database."""
-    db = RoboticsPhotoDatabase()
-    db.connect()
-    
-    robots_data = db.list_all_robots()
-    
+    if _robots_cache['body'] is not None and time.time() - _robots_cache['ts'] < CACHE_TTL_SECONDS:
+        resp = Response(_robots_cache['body'], mimetype='application/json')
+        resp.headers['Cache-Control'] = 'public, max-age=60'
+        return resp
+
+    db = _get_db()
+
+    # Single JOIN returns each robot with its photo IDs already grouped
+    robots_data = db.list_all_robots_with_photos()
+
     # Category mappings
     category_emojis = {
         'Drones': '🚁',
         'AMRs': '🤖',
         'Robotic Arms': '🦾'
     }
-    
+
     marketplace_products = []
-    
+
     for robot in robots_data:
-        # Get all photos for this robot
-        db.cursor.execute("""
-            SELECT photo_id, file_name, description
-            FROM photos
-            WHERE robot_id = ?
-            ORDER BY upload_date DESC
-        """, (robot['robot_id'],))
-        
-        photos = db.cursor.fetchall()
-        photo_urls = [f"/api/photo/{p['photo_id']}" for p in photos]
-        
+        photo_urls = [f"/api/photo/{pid}" for pid in robot['photo_ids']]
+
         # If no photos, use placeholder
         if not photo_urls:
             photo_urls = [
                 f"https://via.placeholder.com/400x300?text={robot['manufacturer']}+{robot['model_name']}"
             ]
-        
-        # Ensure we have at least 4 images for the gallery
-        while len(photo_urls) < 4:
-            photo_urls.append(photo_urls[0])
-        
-        # Build marketplace product object
+
+        # Build marketplace product object (the frontend pads the gallery to 4)
         product = {
             'id': robot['robot_id'],
             'name': robot['model_name'],
@@ -82,7 +196,7 @@ def get_database_robots():
             'price': 'Contact for Quote',
             'priceNote': 'Custom pricing based on requirements',
             'image': photo_urls[0],
-            'images': photo_urls[:4],
+            'images': photo_urls,
             'category': robot['category_name'],
             'type': robot['robot_type'],
             'rating': 4.8,
@@ -94,26 +208,19 @@ def get_database_robots():
             'description': f"Professional {robot['robot_type']} from {robot['manufacturer']}. " + 
                           (f"Released in {robot['year_released']}. " if robot.get('year_released') else "") +
                           f"{robot['photo_count']} photo(s) available in database.",
-            'specs': {
-                'payload': '5-600 kg' if robot['category_name'] == 'AMRs' else '5-15 kg',
-                'battery': '30 min - 12 hrs',
-                'autonomy': 'Advanced Navigation',
-                'speed': '2 m/s' if robot['category_name'] == 'AMRs' else '20 m/s'
-            },
-            'features': [
-                {'icon': '🎯', 'title': 'Precision', 'desc': 'High accuracy operations'},
-                {'icon': '🔒', 'title': 'Safety', 'desc': 'Advanced safety systems'},
-                {'icon': '📊', 'title': 'Analytics', 'desc': 'Real-time monitoring'},
-                {'icon': '🔧', 'title': 'Maintenance', 'desc': 'Easy to service'}
-            ],
-            'applications': ['Manufacturing', 'Warehousing', 'Logistics', 'Inspection']
+            'specs': _SPECS_BY_CAT.get(robot['category_name'], _DEFAULT_SPECS),
+            'features': _FEATURES,
+            'applications': _APPLICATIONS
         }
         
         marketplace_products.append(product)
-    
-    db.close()
-    
-    return jsonify(marketplace_products)
+
+    _robots_cache['body'] = orjson.dumps(marketplace_products)
+    _robots_cache['ts'] = time.time()
+
+    resp = Response(_robots_cache['body'], mimetype='application/json')
+    resp.headers['Cache-Control'] = 'public, max-age=60'
+    return resp
 
 
 if __name__ == '__main__':
@@ -126,4 +233,6 @@ if __name__ == '__main__':
     print("\nNext step: Update marketplace HTML to use /api/database-robots")
     print("\nPress Ctrl+C to stop\n")
     
-    app.run(debug=True, host='127.0.0.1', port=8082)
+    # Production WSGI server: threaded, no debug reloader overhead
+    from waitress import serve
+    serve(app, host='127.0.0.1', port=8082, threads=8)
@@ -4,12 +4,55 @@ Photo Gallery Viewer for Robotics Database
 View all uploaded photos in a beautiful gallery
 """
 
-from flask import Flask, render_template_string, send_file
+from collections import Counter
+
+from flask import Flask, g, send_file, send_from_directory
 from robotics_photo_db import RoboticsPhotoDatabase
 from pathlib import Path
 
 app = Flask(__name__)
 
+
+def _get_db():
+    """Get the shared database connection for this request context."""
+    db = getattr(g, 'db', None)
+    if db is None:
+        db = RoboticsPhotoDatabase()
+        db.connect()
+        g.db = db
+    return db
+
+
+@app.teardown_appcontext
+def _close_db(exception):
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+
+# photo_id -> file_path cache so image requests skip the database
+_photo_paths = {}
+
+
+def _photo_path(photo_id):
+    """Resolve a photo's file path, loading the full mapping on first miss."""
+    try:
+        return _photo_paths[photo_id]
+    except KeyError:
+        pass
+    db = _get_db()
+    db.cursor.execute("SELECT photo_id, file_path FROM photos")
+    for row in db.cursor:
+        _photo_paths[row['photo_id']] = row['file_path']
+    # Remember ids still absent after the reload so repeated requests
+    # for a bad id don't rescan the whole table
+    return _photo_paths.setdefault(photo_id, None)
+
+# All photos live under this root; serving them relative to it lets
+# werkzeug handle conditional (304/Range) responses efficiently
+_PHOTO_ROOT = Path('photo_storage').resolve()
+
+
 # HTML Template for Gallery
 GALLERY_HTML = """
 <!DOCTYPE html>
@@ -272,15 +315,15 @@ GALLERY_HTML = """
                     <div class="stat-label">Total Photos</div>
                 </div>
                 <div class="stat-card">
-                    <div class="stat-number">{{ stats.by_category.get('Drones', 0) }}</div>
+                    <div class="stat-number">{{ stats.drone_photos }}</div>
                     <div class="stat-label">Drone Photos</div>
                 </div>
                 <div class="stat-card">
-                    <div class="stat-number">{{ stats.by_category.get('AMRs', 0) }}</div>
+                    <div class="stat-number">{{ stats.amr_photos }}</div>
                     <div class="stat-label">AMR Photos</div>
                 </div>
                 <div class="stat-card">
-                    <div class="stat-number">{{ stats.by_category.get('Robotic Arms', 0) }}</div>
+                    <div class="stat-number">{{ stats.arm_photos }}</div>
                     <div class="stat-label">Robotic Arm Photos</div>
                 </div>
             </div>
@@ -301,7 +344,7 @@ GALLERY_HTML = """
             <div class="photo-card" data-category="{{ photo.category_name }}" onclick="openLightbox('{{ photo.photo_id }}')">
                 <img src="/photo/{{ photo.photo_id }}" alt="{{ photo.description or photo.file_name }}" class="photo-image">
                 <div class="photo-info">
-                    <div class="category-badge badge-{{ photo.category_name.lower().replace(' ', '-') }}">
+                    <div class="category-badge {{ photo.badge_class }}">
                         {{ photo.category_name }}
                     </div>
                     <div class="photo-title">{{ photo.file_name }}</div>
@@ -369,37 +412,53 @@ GALLERY_HTML = """
 </html>
 """
 
+# Compile the template once at import; render_template_string would
+# re-parse the whole document on every request
+_GALLERY_TPL = app.jinja_env.from_string(GALLERY_HTML)
+
 
 @app.route('/')
 def gallery():
     """Display photo gallery."""
-    db = RoboticsPhotoDatabase()
-    db.connect()
-    
-    # Get all photos with robot info
+    db = _get_db()
+
+    # One query serves both the gallery and its header statistics:
+    # derive the per-category counts from the rows already fetched
     photos = db.search_photos()
-    stats = db.get_statistics()
-    
-    db.close()
-    
-    return render_template_string(GALLERY_HTML, photos=photos, stats=stats)
+    by_category = Counter(p['category_name'] for p in photos)
+
+    # Precompute per-photo badge classes and a flat stats namespace so
+    # the template does no string munging inside its loop
+    for photo in photos:
+        photo['badge_class'] = 'badge-' + photo['category_name'].lower().replace(' ', '-')
+
+    stats = {
+        'total_photos': len(photos),
+        'drone_photos': by_category.get('Drones', 0),
+        'amr_photos': by_category.get('AMRs', 0),
+        'arm_photos': by_category.get('Robotic Arms', 0)
+    }
+
+    return _GALLERY_TPL.render(photos=photos, stats=stats)
 
 
 @app.route('/photo/<int:photo_id>')
 def serve_photo(photo_id):
     """Serve a specific photo."""
-    db = RoboticsPhotoDatabase()
-    db.connect()
-    
-    # Get photo info
-    db.cursor.execute("SELECT file_path FROM photos WHERE photo_id = ?", (photo_id,))
-    result = db.cursor.fetchone()
-    db.close()
-    
+    result = _photo_path(photo_id)
+
     if result:
-        photo_path = Path(result[0])
+        photo_path = Path(result).resolve()
         if photo_path.exists():
-            return send_file(photo_path, mimetype='image/jpeg')
+            try:
+                rel = photo_path.relative_to(_PHOTO_ROOT)
+                resp = send_from_directory(_PHOTO_ROOT, str(rel),
+                                           mimetype='image/jpeg', conditional=True)
+            except ValueError:
+                # Path stored outside the storage root; fall back to send_file
+                resp = send_file(photo_path, mimetype='image/jpeg', conditional=True)
+            resp.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+            return resp
     
     return "Photo not found", 404
 
@@ -414,4 +473,6 @@ if __name__ == '__main__':
     print("✓ Click photos to enlarge")
     print("\nPress Ctrl+C to stop\n")
     
-    app.run(debug=True, host='127.0.0.1', port=8081)
+    # Production WSGI server: threaded, no debug reloader overhead
+    from waitress import serve
+    serve(app, host='127.0.0.1', port=8081, threads=8)
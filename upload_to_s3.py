@@ -3,7 +3,11 @@
 Upload all robot photos from database to AWS S3
 """
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
+from boto3.s3.transfer import TransferConfig
 from robotics_photo_db import RoboticsPhotoDatabase
 from pathlib import Path
 import json
@@ -11,6 +15,34 @@ import json
 # Configuration
 BUCKET_NAME = 'robotics-marketplace-photos'  # Change this to your desired bucket name
 REGION = 'us-east-1'
+MAX_WORKERS = 16
+
+# Multipart uploads for large photos; up to 8 parts in flight per file
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True
+)
+
+_thread_local = threading.local()
+
+# Content type by file extension; anything unknown is served as JPEG
+_EXT_CTYPE = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'gif': 'image/gif',
+}
+
+
+def _s3_client():
+    """One S3 client per worker thread; clients aren't safe to share."""
+    client = getattr(_thread_local, 'client', None)
+    if client is None:
+        client = boto3.session.Session().client('s3', region_name=REGION)
+        _thread_local.client = client
+    return client
 
 def create_bucket():
     """Create S3 bucket if it doesn't exist."""
@@ -40,70 +72,91 @@ def create_bucket():
     print("✓ Bucket configured for public read access")
 
 
+def upload_one(photo):
+    """Upload a single photo; returns (photo_id, url) or None on skip."""
+    photo_id = photo['photo_id']
+    file_path = Path(photo['file_path'])
+    file_name = photo['file_name']
+    robot_id = photo['robot_id']
+
+    if not file_path.exists():
+        print(f"  ⚠ Skipping {file_name} - file not found")
+        return None
+
+    # Create S3 key: photos/category/robot_id/filename
+    s3_key = f"photos/{photo['category_slug']}/robot_{robot_id}/{file_name}"
+
+    # Determine content type based on file extension
+    ext = file_name.rpartition('.')[2].lower()
+    content_type = _EXT_CTYPE.get(ext, 'image/jpeg')
+
+    _s3_client().upload_file(
+        str(file_path),
+        BUCKET_NAME,
+        s3_key,
+        ExtraArgs={'ContentType': content_type},
+        Config=TRANSFER_CONFIG
+    )
+
+    # Generate public URL
+    url = f"https://{BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
+    print(f"  ✓ Uploaded: {file_name} → {s3_key}")
+    return photo_id, url
+
+
 def upload_photos():
-    """Upload all photos from database to S3."""
-    s3 = boto3.client('s3', region_name=REGION)
-    
+    """Upload all photos from database to S3 in parallel."""
     db = RoboticsPhotoDatabase()
     db.connect()
-    
+
     # Get all photos
     db.cursor.execute("""
-        SELECT p.photo_id, p.file_path, p.file_name, r.robot_id, rc.category_name
+        SELECT p.photo_id, p.file_path, p.file_name, r.robot_id,
+               LOWER(REPLACE(rc.category_name, ' ', '-')) AS category_slug
         FROM photos p
         JOIN robots r ON p.robot_id = r.robot_id
         JOIN robot_categories rc ON r.category_id = rc.category_id
     """)
-    
-    photos = db.cursor.fetchall()
-    
-    print(f"\nUploading {len(photos)} photos to S3...")
-    
+
+    print(f"\nUploading photos to S3 with {MAX_WORKERS} workers...")
+
     photo_mapping = {}
-    
-    for photo in photos:
-        photo_id = photo['photo_id']
-        file_path = Path(photo['file_path'])
-        file_name = photo['file_name']
-        robot_id = photo['robot_id']
-        category = photo['category_name'].lower().replace(' ', '-')
-        
-        if not file_path.exists():
-            print(f"  ⚠ Skipping {file_name} - file not found")
-            continue
-        
-        # Create S3 key: photos/category/robot_id/filename
-        s3_key = f"photos/{category}/robot_{robot_id}/{file_name}"
-        
-        # Upload file
-        try:
-            # Determine content type based on file extension
-            content_type = 'image/jpeg'
-            if file_name.lower().endswith('.png'):
-                content_type = 'image/png'
-            elif file_name.lower().endswith('.webp'):
-                content_type = 'image/webp'
-            elif file_name.lower().endswith('.gif'):
-                content_type = 'image/gif'
-            
-            s3.upload_file(
-                str(file_path),
-                BUCKET_NAME,
-                s3_key,
-                ExtraArgs={'ContentType': content_type}
-            )
-            
-            # Generate public URL
-            url = f"https://{BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
-            photo_mapping[photo_id] = url
-            
-            print(f"  ✓ Uploaded: {file_name} → {s3_key}")
-        except Exception as e:
-            print(f"  ✗ Error uploading {file_name}: {e}")
-    
+    mapping_lock = threading.Lock()
+
+    # Bound the number of in-flight rows so streaming the cursor can't
+    # race ahead of the uploads and queue the whole table in memory
+    in_flight = threading.BoundedSemaphore(MAX_WORKERS * 2)
+
+    # Each finished upload is appended (and flushed) to the .jsonl log
+    # immediately, so a crash mid-run keeps everything uploaded so far
+    with open('photo_urls.jsonl', 'w', buffering=1 << 20) as log:
+
+        def _record_result(future, photo):
+            in_flight.release()
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"  ✗ Error uploading {photo['file_name']}: {e}")
+                return
+            if result:
+                with mapping_lock:
+                    photo_mapping[result[0]] = result[1]
+                    log.write(json.dumps({result[0]: result[1]}) + '\n')
+                    log.flush()
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            # Submit rows as the cursor produces them instead of fetchall
+            for photo in db.cursor:
+                in_flight.acquire()
+                future = executor.submit(upload_one, photo)
+                future.add_done_callback(
+                    lambda f, photo=photo: _record_result(f, photo))
+
+    # Write every URL back to the photos table in one bulk transaction
+    db.bulk_set_s3_urls(photo_mapping)
     db.close()
-    
-    # Save mapping to JSON file
+
+    # Compact the log into the single mapping the other tools consume
     with open('photo_urls.json', 'w') as f:
         json.dump(photo_mapping, f, indent=2)
     
@@ -4,10 +4,16 @@ Complete Web Upload Interface for Robotics Photos
 Includes drag-and-drop, bulk upload, and preview
 """
 
-from flask import Flask, render_template_string, request, jsonify, send_file
+from flask import Flask, g, render_template_string, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 from robotics_photo_db import RoboticsPhotoDatabase
 import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
 from pathlib import Path
 import json
 
@@ -18,10 +24,85 @@ app.config['UPLOAD_FOLDER'] = '/tmp/uploads'
 # Ensure upload folder exists
 Path(app.config['UPLOAD_FOLDER']).mkdir(exist_ok=True)
 
-ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
+# Pool of pre-opened connections with PRAGMAs already applied; SQLite
+# serializes writes, but WAL lets the pooled readers run concurrently
+POOL_SIZE = 8
+_db_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+
+def _get_db():
+    """Borrow a pooled connection for this request context."""
+    db = getattr(g, 'db', None)
+    if db is None:
+        try:
+            db = _db_pool.get_nowait()
+        except queue.Empty:
+            db = RoboticsPhotoDatabase()
+            db.connect(check_same_thread=False)
+        g.db = db
+    return db
+
+
+@app.teardown_appcontext
+def _release_db(exception):
+    """Return the request's connection to the pool; never close it."""
+    db = g.pop('db', None)
+    if db is not None:
+        try:
+            _db_pool.put_nowait(db)
+        except queue.Full:
+            db.close()
+
+# Single-writer background worker: requests stage the file and return
+# 202 immediately; this thread does the copy/insert off the request path
+_upload_queue = queue.Queue()
+_upload_jobs = {}
+
+# Finished jobs stay pollable for five minutes, then get evicted so
+# _upload_jobs can't grow without bound over the server's lifetime
+JOB_RETENTION_SECONDS = 300
+_finished_jobs = deque()
+
+
+def _finish_job(job_id, result):
+    """Record a job's final state and evict entries past retention."""
+    _upload_jobs[job_id] = result
+    _finished_jobs.append((time.time(), job_id))
+
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    while _finished_jobs and _finished_jobs[0][0] < cutoff:
+        _, expired = _finished_jobs.popleft()
+        _upload_jobs.pop(expired, None)
+
+
+def _upload_worker():
+    db = RoboticsPhotoDatabase()
+    db.connect()
+    while True:
+        job = _upload_queue.get()
+        try:
+            photo_id = db.add_photo(
+                robot_id=job['robot_id'],
+                source_file=str(job['path']),
+                photo_type=job['photo_type'],
+                description=job['description'],
+                tags=job['tags']
+            )
+            _finish_job(job['job_id'], {'status': 'done', 'photo_id': photo_id})
+        except Exception as e:
+            _finish_job(job['job_id'], {'status': 'error', 'error': str(e)})
+        finally:
+            if job['path'].exists():
+                job['path'].unlink()
+            _upload_queue.task_done()
+
+
+threading.Thread(target=_upload_worker, daemon=True).start()
+
+ALLOWED_EXTENSIONS = frozenset({'jpg', 'jpeg', 'png', 'gif', 'webp'})
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return os.path.splitext(filename)[1][1:].lower() in ALLOWED_EXTENSIONS
 
 
 # HTML Template with drag-and-drop upload
@@ -394,10 +475,7 @@ def index():
 
 @app.route('/api/robots')
 def get_robots():
-    db = RoboticsPhotoDatabase()
-    db.connect()
-    robots = db.list_all_robots()
-    db.close()
+    robots = _get_db().list_all_robots()
     return jsonify(robots)
 
 
@@ -409,36 +487,53 @@ def upload_photo():
     file = request.files['file']
     if file.filename == '' or not allowed_file(file.filename):
         return jsonify({'success': False, 'error': 'Invalid file'}), 400
-    
-    # Save temporarily
+
     filename = secure_filename(file.filename)
-    temp_path = Path(app.config['UPLOAD_FOLDER']) / filename
-    file.save(temp_path)
-    
+
+    # Validate the request fields before any disk I/O happens
     try:
-        db = RoboticsPhotoDatabase()
-        db.connect()
-        
-        tags = request.form.get('tags', '').split(',') if request.form.get('tags') else None
-        tags = [t.strip() for t in tags if t.strip()] if tags else None
-        
-        photo_id = db.add_photo(
-            robot_id=int(request.form.get('robot_id')),
-            source_file=str(temp_path),
-            photo_type=request.form.get('photo_type', 'general'),
-            description=request.form.get('description'),
-            tags=tags
-        )
-        
-        db.close()
-        return jsonify({'success': True, 'photo_id': photo_id})
-    
+        robot_id = int(request.form.get('robot_id', ''))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid robot_id'}), 400
+
+    tags = request.form.get('tags', '').split(',') if request.form.get('tags') else None
+    tags = [t.strip() for t in tags if t.strip()] if tags else None
+
+    # Stage the stream and hand it to the background worker; the
+    # client gets its 202 before the storage copy and insert run
+    job_id = uuid.uuid4().hex
+    staging_path = Path(app.config['UPLOAD_FOLDER']) / f"{job_id}_{filename}"
+
+    try:
+        with open(staging_path, 'wb', buffering=1 << 20) as dst:
+            shutil.copyfileobj(file.stream, dst, length=1 << 18)
+
+        _upload_jobs[job_id] = {'status': 'pending'}
+        _upload_queue.put({
+            'job_id': job_id,
+            'robot_id': robot_id,
+            'path': staging_path,
+            'photo_type': request.form.get('photo_type', 'general'),
+            'description': request.form.get('description'),
+            'tags': tags
+        })
+
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'pending'}), 202
+
     except Exception as e:
+        # Don't leak the staging file or a forever-pending job
+        if staging_path.exists():
+            staging_path.unlink()
+        _finish_job(job_id, {'status': 'error', 'error': str(e)})
         return jsonify({'success': False, 'error': str(e)}), 500
-    
-    finally:
-        if temp_path.exists():
-            temp_path.unlink()
+
+
+@app.route('/api/status/<job_id>')
+def upload_status(job_id):
+    job = _upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
 
 
 if __name__ == '__main__':
@@ -450,4 +545,6 @@ if __name__ == '__main__':
     print("✓ Supports bulk uploads")
     print("\nPress Ctrl+C to stop\n")
     
-    app.run(debug=True, host='127.0.0.1', port=8080)
+    # Production WSGI server: threaded, no debug reloader overhead
+    from waitress import serve
+    serve(app, host='127.0.0.1', port=8080, threads=8)